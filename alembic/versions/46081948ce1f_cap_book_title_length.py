@@ -0,0 +1,29 @@
+"""Cap book title length
+
+Revision ID: 46081948ce1f
+Revises: c728a7d64219
+Create Date: 2026-10-15 23:12:08.451307
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '46081948ce1f'
+down_revision: Union[str, Sequence[str], None] = 'c728a7d64219'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Keeps every title within the B-tree row limit of ix_books_title_id
+    op.alter_column('books', 'title', existing_type=sa.String(), type_=sa.String(length=255), existing_nullable=False, postgresql_using='left(title, 255)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.alter_column('books', 'title', existing_type=sa.String(length=255), type_=sa.String(), existing_nullable=False)
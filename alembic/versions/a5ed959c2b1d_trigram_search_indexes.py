@@ -0,0 +1,33 @@
+"""Trigram search indexes
+
+Revision ID: a5ed959c2b1d
+Revises: ba5881f444f1
+Create Date: 2026-10-15 09:48:03.551920
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a5ed959c2b1d'
+down_revision: Union[str, Sequence[str], None] = 'ba5881f444f1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_books_title_trgm', 'books', ['title'], unique=False, postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
+    op.create_index('ix_books_genre_trgm', 'books', ['genre'], unique=False, postgresql_using='gin', postgresql_ops={'genre': 'gin_trgm_ops'})
+    op.create_index('ix_users_username_trgm', 'users', ['username'], unique=False, postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_users_username_trgm', table_name='users', postgresql_using='gin', postgresql_ops={'username': 'gin_trgm_ops'})
+    op.drop_index('ix_books_genre_trgm', table_name='books', postgresql_using='gin', postgresql_ops={'genre': 'gin_trgm_ops'})
+    op.drop_index('ix_books_title_trgm', table_name='books', postgresql_using='gin', postgresql_ops={'title': 'gin_trgm_ops'})
@@ -1,8 +1,7 @@
 from sqlalchemy import text
-from sqlalchemy.future import select
-from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 
 from app.models.user import User
 from app.db.database import get_db
@@ -15,42 +14,42 @@ router = APIRouter(prefix="/auth", tags=["auth"])
 @router.post("/register", response_model=UserOut, summary="Register a new user")
 async def register(user_in: UserCreate, db: AsyncSession = Depends(get_db)) -> User:
     """REGISTER A NEW USER"""
-    user_query = text("SELECT id FROM users WHERE username = :username")
-    user_raw = await db.execute(user_query, {"username": user_in.username})
-    user = user_raw.scalar()
-    if user:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="This username is already in use",
-        )
-
     insert_user_query = text(
         """
         INSERT INTO users (username, first_name, last_name, email, hashed_password)
         VALUES (:username, :first_name, :last_name, :email, :hashed_password)
+        ON CONFLICT DO NOTHING
         RETURNING id, username, first_name, last_name, email, hashed_password, created_at
         """
     )
-    hashed_pw = get_password_hash(user_in.password)
+    hashed_pw = await run_in_threadpool(get_password_hash, user_in.password)
 
-    try:
-        new_user_raw = await db.execute(
-            insert_user_query,
-            {
-                "username": user_in.username,
-                "first_name": user_in.first_name,
-                "last_name": user_in.last_name,
-                "email": user_in.email,
-                "hashed_password": hashed_pw,
-            },
+    new_user_raw = await db.execute(
+        insert_user_query,
+        {
+            "username": user_in.username,
+            "first_name": user_in.first_name,
+            "last_name": user_in.last_name,
+            "email": user_in.email,
+            "hashed_password": hashed_pw,
+        },
+    )
+    new_user = new_user_raw.fetchone()
+    if new_user is None:
+        user_query = text(
+            "SELECT EXISTS (SELECT 1 FROM users WHERE username = :username)"
         )
-    except IntegrityError:
+        user_raw = await db.execute(user_query, {"username": user_in.username})
+        if user_raw.scalar():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="This username is already in use",
+            )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="This email is already in use",
         )
     await db.commit()
-    new_user = new_user_raw.fetchone()
 
     user_out = User(
         id=new_user.id,
@@ -71,7 +70,9 @@ async def login(user_in: UserLogin, db: AsyncSession = Depends(get_db)):
     user_query = text("SELECT * FROM users WHERE username = :username")
     user_raw = await db.execute(user_query, {"username": user_in.username})
     user = user_raw.first()
-    if not user or not verify_password(user_in.password, user.hashed_password):
+    if not user or not await run_in_threadpool(
+        verify_password, user_in.password, user.hashed_password
+    ):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid credentials"
         )
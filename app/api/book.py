@@ -1,20 +1,106 @@
 import io
 import csv
+import base64
+import codecs
 import json
-import datetime
 
-from sqlalchemy import text
-from pydantic import ValidationError
-from sqlalchemy.ext.asyncio import AsyncSession
-from fastapi.responses import JSONResponse, StreamingResponse
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+import orjson
+from sqlalchemy import JSON, func, select, text, tuple_
+from typing import Sequence
+from sqlalchemy.engine import Row
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession, async_sessionmaker
+from fastapi.responses import StreamingResponse
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    status,
+    UploadFile,
+    File,
+    Query,
+    Response,
+)
 
+from app.models.book import Book
 from app.models.user import User
-from app.db.database import get_db
+from app.db.database import get_db, get_sessionmaker
 from app.core.security import get_current_user
 from app.schemas.book import BookOut, BookCreate, BookUpdate, BookFilter
 
 router = APIRouter()
+book_list_adapter = TypeAdapter(list[BookCreate])
+
+EXPORT_BATCH_SIZE = 1000
+EXPORT_FIELDS = ["id", "title", "genre", "published_year", "author"]
+
+
+def _is_int4(value) -> bool:
+    """CHECK THAT A DECODED CURSOR VALUE FITS A POSTGRES INTEGER COLUMN"""
+    return type(value) is int and -(2**31) <= value < 2**31
+
+
+def _encode_cursor(sort_value: str | int, book_id: int) -> str:
+    """ENCODE THE LAST SEEN (SORT VALUE, ID) PAIR AS AN OPAQUE CURSOR"""
+    return base64.urlsafe_b64encode(json.dumps([sort_value, book_id]).encode()).decode()
+
+
+def _decode_cursor(cursor: str, sort_by: str) -> tuple[str | int, int]:
+    """DECODE A CURSOR PRODUCED BY _encode_cursor FOR THE GIVEN SORT COLUMN"""
+    invalid_cursor = HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Provided pagination cursor is incorrect",
+    )
+    try:
+        sort_value, book_id = json.loads(base64.urlsafe_b64decode(cursor))
+    except (ValueError, TypeError):
+        raise invalid_cursor
+
+    # Anything the database would reject must fail here as a 400, not a 500
+    if sort_by == "published_year":
+        valid_sort_value = _is_int4(sort_value)
+    else:
+        valid_sort_value = isinstance(sort_value, str) and "\x00" not in sort_value
+    if not valid_sort_value or not _is_int4(book_id):
+        raise invalid_cursor
+
+    return sort_value, book_id
+
+
+async def stream_exported_books(
+    session: AsyncSession,
+    books_raw: AsyncResult,
+    first_books: Sequence[Row],
+    format: str,
+):
+    """STREAM ALL BOOKS AS JSON OR CSV IN BATCHES FROM A SERVER-SIDE CURSOR"""
+
+    async def batches():
+        yield first_books
+        async for books in books_raw.partitions():
+            yield books
+
+    try:
+        if format == "json":
+            separator = b"["
+            async for books in batches():
+                yield separator + b",".join(
+                    orjson.dumps(book._asdict()) for book in books
+                )
+                separator = b","
+            yield b"]"
+
+        elif format == "csv":
+            output = io.StringIO()
+            writer = csv.writer(output)
+            writer.writerow(EXPORT_FIELDS)
+            async for books in batches():
+                writer.writerows(books)
+                yield output.getvalue()
+                output.seek(0)
+                output.truncate()
+    finally:
+        await session.close()
 
 
 @router.post("/create", response_model=BookOut, summary="Create a new book")
@@ -24,24 +110,25 @@ async def create_book(
     current_user: User = Depends(get_current_user),
 ):
     """CREATE A NEW BOOK"""
-    if len(book.title) == 0 or book.title is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Book title can't be empty",
-        )
-
-    now = datetime.datetime.now()
-    if book.published_year < 1800 or book.published_year > now.year:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Provided book year is incorrect",
-        )
-
     new_book_query = text(
         """
-        INSERT INTO books (title, genre, published_year, user_id)
-        VALUES (:title, :genre, :published_year, :user_id)
-        RETURNING id
+        WITH new_book AS (
+            INSERT INTO books (title, genre, published_year, user_id)
+            VALUES (:title, :genre, :published_year, :user_id)
+            RETURNING id, title, genre, published_year, user_id
+        )
+        SELECT
+            new_book.id,
+            new_book.title,
+            new_book.genre,
+            new_book.published_year,
+            users.id AS author_id,
+            users.username AS author_username,
+            users.first_name AS author_first_name,
+            users.last_name AS author_last_name,
+            users.email AS author_email
+        FROM new_book
+        JOIN users ON new_book.user_id = users.id
     """
     )
     book_raw = await db.execute(
@@ -53,33 +140,8 @@ async def create_book(
             "user_id": current_user.id,
         },
     )
-    await db.commit()
-    new_book_id = book_raw.scalar_one()
-
-    book_query = text(
-        """
-        SELECT
-            books.id,
-            books.title,
-            books.genre,
-            books.published_year,
-            users.id AS author_id,
-            users.username AS author_username,
-            users.first_name AS author_first_name,
-            users.last_name AS author_last_name,
-            users.email AS author_email
-        FROM books
-        JOIN users ON books.user_id = users.id
-        WHERE books.id = :book_id
-    """
-    )
-    book_raw = await db.execute(book_query, {"book_id": new_book_id})
     book = book_raw.one()
-    if not book:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="No book was found",
-        )
+    await db.commit()
 
     book_out = {
         "id": book.id,
@@ -100,96 +162,98 @@ async def create_book(
 
 @router.post("/get", summary="Retrieve all available books")
 async def retrieve_books(
+    response: Response,
     filters: BookFilter = Depends(),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
     """RETRIEVE ALL FILTERED BOOKS"""
-    book_query = """
-        SELECT
-            books.id,
-            books.title,
-            books.genre,
-            books.published_year,
-            users.id AS author_id,
-            users.username AS author_username,
-            users.first_name AS author_first_name,
-            users.last_name AS author_last_name,
-            users.email AS author_email
-        FROM books
-        JOIN users ON books.user_id = users.id
-        WHERE 1=1
-    """
-    params = {}
+    book_query = (
+        select(
+            func.json_build_object(
+                "id",
+                Book.id,
+                "title",
+                Book.title,
+                "genre",
+                Book.genre,
+                "published_year",
+                Book.published_year,
+                "author",
+                func.json_build_object(
+                    "id",
+                    User.id,
+                    "username",
+                    User.username,
+                    "first_name",
+                    User.first_name,
+                    "last_name",
+                    User.last_name,
+                    "email",
+                    User.email,
+                ),
+                type_=JSON,
+            ).label("book"),
+            Book.id.label("book_id"),
+        )
+        .select_from(Book)
+        .join(User, Book.user_id == User.id)
+    )
 
     # Filtering
     if filters.title:
-        book_query += " AND books.title ILIKE :title"
-        params["title"] = f"%{filters.title}%"
+        book_query = book_query.where(Book.title.ilike(f"%{filters.title}%"))
 
     if filters.author:
-        book_query += """
-            AND (
-                users.username ILIKE :author OR
-                users.first_name ILIKE :author OR
-                users.last_name ILIKE :author
-            )
-            """
-        params["author"] = f"%{filters.author}%"
+        book_query = book_query.where(User.full_name.ilike(f"%{filters.author}%"))
 
     if filters.genre:
-        book_query += " AND books.genre ILIKE :genre"
-        params["genre"] = f"%{filters.genre}%"
+        book_query = book_query.where(Book.genre.ilike(f"%{filters.genre}%"))
 
     if filters.year_from:
-        book_query += " AND books.published_year >= :year_from"
-        params["year_from"] = filters.year_from
+        book_query = book_query.where(Book.published_year >= filters.year_from)
 
     if filters.year_to:
-        book_query += " AND books.published_year <= :year_to"
-        params["year_to"] = filters.year_to
+        book_query = book_query.where(Book.published_year <= filters.year_to)
 
     # Sorting
     sort_columns = {
-        "title": "books.title",
-        "published_year": "books.published_year",
-        "author": "users.username",
+        "title": Book.title,
+        "published_year": Book.published_year,
+        "author": User.username,
     }
-    book_query += (
-        f" ORDER BY {sort_columns[filters.sort_by]} {filters.sort_order.upper()}"
+    sort_column = sort_columns[filters.sort_by]
+    book_query = book_query.add_columns(sort_column.label("sort_value")).order_by(
+        getattr(sort_column, filters.sort_order)(),
+        getattr(Book.id, filters.sort_order)(),
     )
 
     # Pagination
-    book_query += " LIMIT :limit OFFSET :offset"
-    params["limit"] = filters.limit
-    params["offset"] = filters.offset
-
-    books_raw = await db.execute(text(book_query), params)
-    books = books_raw.fetchall()
+    if filters.cursor:
+        sort_value, book_id = _decode_cursor(filters.cursor, filters.sort_by)
+        sort_key = tuple_(sort_column, Book.id)
+        if filters.sort_order == "asc":
+            book_query = book_query.where(sort_key > (sort_value, book_id))
+        else:
+            book_query = book_query.where(sort_key < (sort_value, book_id))
+
+    book_query = book_query.limit(filters.limit).offset(filters.offset)
+
+    books_raw = await db.execute(book_query)
+    books = books_raw.all()
     if not books:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No books were found",
         )
 
-    list_of_books = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "genre": book.genre,
-            "published_year": book.published_year,
-            "author": {
-                "id": book.author_id,
-                "username": book.author_username,
-                "first_name": book.author_first_name,
-                "last_name": book.author_last_name,
-                "email": book.author_email,
-            },
-        }
-        for book in books
-    ]
+    if len(books) == filters.limit:
+        last_book = books[-1]
+        response.headers["X-Next-Cursor"] = _encode_cursor(
+            last_book.sort_value, last_book.book_id
+        )
 
-    return list_of_books
+    return [book.book for book in books]
 
 
 @router.get("/get/my", summary="Retrieve all books created by user")
@@ -201,47 +265,34 @@ async def retrieve_my_books(
     book_query = text(
         """
             SELECT
-                books.id,
-                books.title,
-                books.genre,
-                books.published_year,
-                users.id AS author_id,
-                users.username AS author_username,
-                users.first_name AS author_first_name,
-                users.last_name AS author_last_name,
-                users.email AS author_email
+                json_build_object(
+                    'id', books.id,
+                    'title', books.title,
+                    'genre', books.genre,
+                    'published_year', books.published_year,
+                    'author', json_build_object(
+                        'id', users.id,
+                        'username', users.username,
+                        'first_name', users.first_name,
+                        'last_name', users.last_name,
+                        'email', users.email
+                    )
+                ) AS book
             FROM books
             JOIN users ON books.user_id = users.id
             WHERE books.user_id = :user_id
         """
-    )
+    ).columns(book=JSON)
 
     books_raw = await db.execute(book_query, {"user_id": current_user.id})
-    books = books_raw.fetchall()
+    books = books_raw.scalars().all()
     if not books:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="No books were found",
         )
 
-    list_of_books = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "genre": book.genre,
-            "published_year": book.published_year,
-            "author": {
-                "id": book.author_id,
-                "username": book.author_username,
-                "first_name": book.author_first_name,
-                "last_name": book.author_last_name,
-                "email": book.author_email,
-            },
-        }
-        for book in books
-    ]
-
-    return list_of_books
+    return books
 
 
 @router.get("/get/{book_id}", summary="Retrieve one book by id")
@@ -259,9 +310,19 @@ async def retrieve_book(
 
     book_query = text(
         """
-        SELECT id, title, genre, published_year, user_id
+        SELECT
+            books.id,
+            books.title,
+            books.genre,
+            books.published_year,
+            users.id AS author_id,
+            users.username AS author_username,
+            users.first_name AS author_first_name,
+            users.last_name AS author_last_name,
+            users.email AS author_email
         FROM books
-        WHERE id = :book_id
+        JOIN users ON books.user_id = users.id
+        WHERE books.id = :book_id
         """
     )
     book_raw = await db.execute(book_query, {"book_id": book_id})
@@ -272,32 +333,17 @@ async def retrieve_book(
             detail="Book with such ID was not found",
         )
 
-    user_query = text(
-        """
-        SELECT id, username, first_name, last_name, email
-        FROM users
-        WHERE id = :user_id
-        """
-    )
-    user_raw = await db.execute(user_query, {"user_id": current_user.id})
-    user = user_raw.first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User with such ID was not found",
-        )
-
     book_out = {
         "id": book.id,
         "title": book.title,
         "genre": book.genre,
         "published_year": book.published_year,
         "author": {
-            "id": user.id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
+            "id": book.author_id,
+            "username": book.author_username,
+            "first_name": book.author_first_name,
+            "last_name": book.author_last_name,
+            "email": book.author_email,
         },
     }
 
@@ -312,19 +358,6 @@ async def update_book(
     current_user: User = Depends(get_current_user),
 ):
     """UPDATE ONE BOOK"""
-    if len(book_update.title) == 0 or book_update.title is None:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Book title can't be empty",
-        )
-
-    now = datetime.datetime.now()
-    if book_update.published_year < 1800 or book_update.published_year > now.year:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Provided book year is incorrect",
-        )
-
     book_query = text("SELECT * FROM books WHERE id = :book_id")
     book_raw = await db.execute(book_query, {"book_id": book_id})
     book = book_raw.first()
@@ -377,32 +410,17 @@ async def update_book(
             detail="Book with such ID was not found",
         )
 
-    user_query = text(
-        """
-        SELECT id, username, first_name, last_name, email
-        FROM users
-        WHERE id = :user_id
-        """
-    )
-    user_raw = await db.execute(user_query, {"user_id": current_user.id})
-    user = user_raw.first()
-    if not user:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User with such ID was not found",
-        )
-
     book_out = {
         "id": updated_book.id,
         "title": updated_book.title,
         "genre": updated_book.genre,
         "published_year": updated_book.published_year,
         "author": {
-            "id": user.id,
-            "username": user.username,
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "email": user.email,
+            "id": current_user.id,
+            "username": current_user.username,
+            "first_name": current_user.first_name,
+            "last_name": current_user.last_name,
+            "email": current_user.email,
         },
     }
 
@@ -420,24 +438,27 @@ async def delete_book(
     current_user: User = Depends(get_current_user),
 ):
     """DELETE ONE BOOK"""
-    book_query = text("SELECT user_id FROM books WHERE id = :book_id")
-    book_raw = await db.execute(book_query, {"book_id": book_id})
-    book = book_raw.first()
+    delete_query = text(
+        "DELETE FROM books WHERE id = :book_id AND user_id = :user_id RETURNING id"
+    )
+    deleted_raw = await db.execute(
+        delete_query, {"book_id": book_id, "user_id": current_user.id}
+    )
+    if deleted_raw.first():
+        await db.commit()
+        return
 
-    if not book:
+    book_query = text("SELECT EXISTS (SELECT 1 FROM books WHERE id = :book_id)")
+    book_raw = await db.execute(book_query, {"book_id": book_id})
+    if not book_raw.scalar():
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Book with such ID was not found",
         )
-    if book.user_id != current_user.id:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authorized to update this book",
-        )
-
-    delete_query = text("DELETE FROM books WHERE id = :book_id")
-    await db.execute(delete_query, {"book_id": book_id})
-    await db.commit()
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authorized to update this book",
+    )
 
 
 @router.post("/import", summary="Bulk import books from file")
@@ -452,102 +473,76 @@ async def import_books(
             status_code=status.HTTP_400_BAD_REQUEST, detail="File must be CSV or JSON"
         )
 
-    books_to_insert = []
+    rows = []
 
     if file.content_type == "text/csv":
-        content = await file.read()
-        decoded = content.decode("utf-8")
-        reader = csv.DictReader(io.StringIO(decoded))
+        reader = csv.DictReader(codecs.iterdecode(file.file, "utf-8"))
 
         for row in reader:
             try:
-                if len(row["title"]) == 0 or row["title"] is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Title can't be empty",
-                    )
-                if (
-                    int(row["published_year"]) < 1800
-                    or int(row["published_year"]) > datetime.datetime.now().year
-                ):
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Published year provided is incorrect",
-                    )
-
-                book_data = BookCreate(
-                    title=row["title"],
-                    genre=row["genre"],
-                    published_year=int(row["published_year"]),
+                rows.append(
+                    {
+                        "title": row["title"],
+                        "genre": row["genre"],
+                        "published_year": row["published_year"],
+                    }
                 )
-                books_to_insert.append(book_data)
             except KeyError:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail="CSV missing required fields",
                 )
-            except ValidationError:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Data provided is incorrect",
-                )
 
     elif file.content_type == "application/json":
         content = await file.read()
         try:
             data = json.loads(content)
             for item in data:
-                if len(item["title"]) == 0 or item["title"] is None:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Title can't be empty",
-                    )
-                if (
-                    int(item["published_year"]) < 1800
-                    or int(item["published_year"]) > datetime.datetime.now().year
-                ):
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="Published year provided is incorrect",
-                    )
-                book_data = BookCreate(
-                    title=item["title"],
-                    genre=item["genre"],
-                    published_year=int(item["published_year"]),
+                rows.append(
+                    {
+                        "title": item["title"],
+                        "genre": item["genre"],
+                        "published_year": item["published_year"],
+                    }
                 )
-                books_to_insert.append(book_data)
         except (json.JSONDecodeError, KeyError, TypeError):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid JSON structure"
             )
-        except ValidationError:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Data provided is incorrect",
-            )
+
+    try:
+        books_to_insert = book_list_adapter.validate_python(rows)
+    except ValidationError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data provided is incorrect",
+        )
 
     if not books_to_insert:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST, detail="No valid books to import"
         )
 
-    for book in books_to_insert:
-        book_query = text(
-            """
-            INSERT INTO books (title, genre, published_year, user_id)
-            VALUES (:title, :genre, :published_year, :user_id)
+    book_query = text(
         """
-        )
-        await db.execute(
-            book_query,
+        INSERT INTO books (title, genre, published_year, user_id)
+        VALUES (:title, :genre, :published_year, :user_id)
+    """
+    )
+    # Insert on the session's connection directly, skipping ORM flush handling
+    connection = await db.connection()
+    await connection.execute(
+        book_query,
+        [
             {
                 "title": book.title,
                 "genre": book.genre,
                 "published_year": book.published_year,
                 "user_id": current_user.id,
-            },
-        )
-
+            }
+            for book in books_to_insert
+        ],
+    )
     await db.commit()
 
     return {"message": f"{len(books_to_insert)} books imported successfully."}
@@ -556,13 +551,13 @@ async def import_books(
 @router.get("/export", summary="Export books in JSON or CSV format")
 async def export_books(
     format: str = Query("json", pattern="^(json|csv)$"),
-    db: AsyncSession = Depends(get_db),
+    session_factory: async_sessionmaker[AsyncSession] = Depends(get_sessionmaker),
     current_user: User = Depends(get_current_user),
 ):
     """EXPORT BOOKS IN JSON AND CSV FORMAT"""
     books_query = text(
         """
-        SELECT 
+        SELECT
             books.id,
             books.title,
             books.genre,
@@ -571,37 +566,32 @@ async def export_books(
         FROM books
         JOIN users ON books.user_id = users.id
     """
-    )
-
-    books_raw = await db.execute(books_query)
-    books = books_raw.fetchall()
-    if not books:
+    ).execution_options(yield_per=EXPORT_BATCH_SIZE)
+
+    # The request session is closed before the response body is sent, so the
+    # cursor gets a session of its own, closed by the stream once it is done.
+    # The first batch is read up front to answer 404 from the same snapshot
+    session = session_factory()
+    try:
+        books_raw = await session.stream(books_query)
+        first_books = await books_raw.fetchmany(EXPORT_BATCH_SIZE)
+    except BaseException:
+        await session.close()
+        raise
+
+    if not first_books:
+        await session.close()
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No books found"
         )
 
-    books_out = [
-        {
-            "id": book.id,
-            "title": book.title,
-            "genre": book.genre,
-            "published_year": book.published_year,
-            "author": book.author,
-        }
-        for book in books
-    ]
-
+    books_stream = stream_exported_books(session, books_raw, first_books, format)
     if format == "json":
-        return JSONResponse(content=books_out)
+        return StreamingResponse(books_stream, media_type="application/json")
 
     elif format == "csv":
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=books_out[0].keys())
-        writer.writeheader()
-        writer.writerows(books_out)
-        output.seek(0)
         return StreamingResponse(
-            output,
+            books_stream,
             media_type="text/csv",
             headers={"Content-Disposition": "attachment; filename=books.csv"},
         )
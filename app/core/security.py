@@ -1,35 +1,102 @@
+import jwt
+import time
+import bcrypt
 from typing import Optional
-from jose import JWTError, jwt
+from functools import lru_cache
+from collections import OrderedDict
+from argon2 import PasswordHasher, Type
+from argon2.exceptions import InvalidHashError, VerificationError
 from sqlalchemy.future import select
-from datetime import datetime, timedelta
-from passlib.context import CryptContext
+from datetime import datetime, timedelta, timezone
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import Depends, HTTPException, status, Security
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 
 from app.models.user import User
 from app.db.database import get_db
-from app.core.config import SECRET_KEY, ALGORITHM, ACCESS_TOKEN_EXPIRE_MINUTES
+from app.core.config import (
+    ENV,
+    SECRET_KEY,
+    ALGORITHM,
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    USER_CACHE_TTL_SECONDS,
+    USER_CACHE_MAXSIZE,
+)
+
+if ALGORITHM is None or ALGORITHM not in {"HS256", "HS384", "HS512"}:
+    raise RuntimeError(f"ALGORITHM must be HS256, HS384 or HS512, got {ALGORITHM!r}")
+if not SECRET_KEY:
+    raise RuntimeError("SECRET_KEY is not set")
 
 bearer_scheme = HTTPBearer()
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+jwt_decoder = jwt.PyJWT()
+# Narrowed by the checks above, so functions see plain str
+jwt_algorithm: str = ALGORITHM
+jwt_key = SECRET_KEY.encode()
+if ENV == "test":
+    # The test suite doesn't need production KDF strength
+    password_hasher = PasswordHasher(
+        time_cost=1, memory_cost=8 * 1024, parallelism=1, type=Type.ID
+    )
+else:
+    password_hasher = PasswordHasher(
+        time_cost=2, memory_cost=46 * 1024, parallelism=1, type=Type.ID
+    )
+
+# username -> (monotonic expiry, detached User)
+_user_cache: OrderedDict[str, tuple[float, User]] = OrderedDict()
+
+
+def verify_password(plain_password: str, hashed_password: str) -> bool:
+    # argon2-cffi and bcrypt both compare digests in constant time
+    if not hashed_password.startswith("$argon2"):
+        # Users registered before the switch to Argon2 still have bcrypt hashes
+        try:
+            return bcrypt.checkpw(plain_password.encode(), hashed_password.encode())
+        except ValueError:
+            return False
+    try:
+        return password_hasher.verify(hashed_password, plain_password)
+    except (VerificationError, InvalidHashError):
+        return False
 
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+if ENV == "test":
+    # Repeated checks of the same credentials skip the KDF. Never enabled
+    # outside tests, as it would keep plaintext passwords in memory
+    verify_password = lru_cache(maxsize=1024)(verify_password)
 
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+def get_password_hash(password: str) -> str:
+    return password_hasher.hash(password)
 
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
+def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
-    expire = datetime.utcnow() + (
+    expire = datetime.now(timezone.utc) + (
         expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     )
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    return jwt.encode(to_encode, jwt_key, algorithm=jwt_algorithm)
+
+
+def _get_cached_user(username: str) -> Optional[User]:
+    entry = _user_cache.get(username)
+    if entry is None:
+        return None
+    expires_at, user = entry
+    if expires_at <= time.monotonic():
+        del _user_cache[username]
+        return None
+    _user_cache.move_to_end(username)
+    return user
+
+
+def _cache_user(username: str, user: User) -> None:
+    _user_cache[username] = (time.monotonic() + USER_CACHE_TTL_SECONDS, user)
+    _user_cache.move_to_end(username)
+    while len(_user_cache) > USER_CACHE_MAXSIZE:
+        _user_cache.popitem(last=False)
 
 
 async def get_current_user(
@@ -42,15 +109,26 @@ async def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+        payload = jwt_decoder.decode(
+            token.credentials,
+            jwt_key,
+            algorithms=[jwt_algorithm],
+            options={"require": ["exp", "sub"]},
+        )
+    except jwt.InvalidTokenError:
         raise credentials_exception
+    username: str = payload["sub"]
+
+    user = _get_cached_user(username)
+    if user is not None:
+        return user
 
     result = await db.execute(select(User).where(User.username == username))
     user = result.scalars().first()
     if user is None:
         raise credentials_exception
+
+    # Detach so the cached instance is never expired or refreshed by a session
+    db.expunge(user)
+    _cache_user(username, user)
     return user
@@ -1,10 +1,11 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 
 from app.api import book, auth
 
 
 def application_factory(openapi_url: str = "/openapi.json") -> FastAPI:
-    app = FastAPI(openapi_url=openapi_url)
+    app = FastAPI(default_response_class=ORJSONResponse, openapi_url=openapi_url)
 
     app.include_router(auth.router)
     app.include_router(book.router, prefix="/api/books", tags=["books"])
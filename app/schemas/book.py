@@ -1,6 +1,7 @@
+import datetime
 from enum import Enum
-from pydantic import BaseModel, Field
-from typing import Literal
+from pydantic import AfterValidator, BaseModel, Field, StringConstraints
+from typing import Annotated, Literal
 
 from app.schemas.user import UserOut
 
@@ -12,10 +13,22 @@ class GenreEnum(str, Enum):
     history = "History"
 
 
+def check_published_year(published_year: int) -> int:
+    if published_year > datetime.date.today().year:
+        raise ValueError("Provided book year is incorrect")
+    return published_year
+
+
+BookTitle = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=255)
+]
+PublishedYear = Annotated[int, Field(ge=1800), AfterValidator(check_published_year)]
+
+
 class BookBase(BaseModel):
-    title: str
+    title: BookTitle
     genre: GenreEnum
-    published_year: int
+    published_year: PublishedYear
 
 
 class BookCreate(BookBase):
@@ -23,9 +36,9 @@ class BookCreate(BookBase):
 
 
 class BookUpdate(BaseModel):
-    title: str | None = None
+    title: BookTitle | None = None
     genre: GenreEnum | None = None
-    published_year: int | None = None
+    published_year: PublishedYear | None = None
 
 
 class BookOut(BookBase):
@@ -48,6 +61,9 @@ class BookFilter(BaseModel):
 
     limit: int = Field(10, ge=1, le=100, description="Limit number of results")
     offset: int = Field(0, ge=0, description="Skip number of results")
+    cursor: str | None = Field(
+        None, description="X-Next-Cursor value returned with the previous page"
+    )
 
     sort_by: Literal["title", "published_year", "author"] = Field("title")
     sort_order: Literal["asc", "desc"] = Field("asc")
@@ -1,49 +1,111 @@
-import random
+import os
+import time
+import asyncio
+import secrets
 import pytest
 import pytest_asyncio
 
+from itertools import count
 from httpx import AsyncClient, ASGITransport
-from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+# Must be set before the app is imported: it selects cheap KDF parameters
+os.environ.setdefault("ENV", "test")
 
 from app.main import app
-from app.db.database import async_session
+from app.db.database import engine, async_session, get_db, get_sessionmaker
+
+
+@pytest.fixture(scope="session")
+def usernames():
+    # Time-ordered like UUIDv7: the timestamp prefix keeps inserts at the right
+    # edge of the username index, the random suffix rules out collisions
+    return (f"{time.time_ns():x}{secrets.token_hex(4)}" for _ in count())
+
+
+@pytest_asyncio.fixture(scope="session")
+async def db_connection():
+    # Everything the tests write happens inside one transaction that is
+    # rolled back at the end. Sessions join it without savepoints: commit()
+    # leaves it open, and closing the request session cannot roll back a
+    # cursor that a streamed response opened after it
+    async with engine.connect() as connection:
+        transaction = await connection.begin()
+        test_sessionmaker = async_sessionmaker(
+            bind=connection,
+            class_=AsyncSession,
+            expire_on_commit=False,
+            join_transaction_mode="rollback_only",
+        )
+        # Requests share the connection, so they take turns; tests that need
+        # real concurrency use committed_usernames instead
+        request_lock = asyncio.Lock()
+
+        async def override_get_db():
+            async with request_lock:
+                async with test_sessionmaker() as session:
+                    yield session
+
+        app.dependency_overrides[get_db] = override_get_db
+        app.dependency_overrides[get_sessionmaker] = lambda: test_sessionmaker
+        yield connection
+        app.dependency_overrides.pop(get_sessionmaker)
+        app.dependency_overrides.pop(get_db)
+        await transaction.rollback()
 
 
 @pytest_asyncio.fixture
-async def async_client():
+async def committed_usernames(db_connection):
+    # Lets requests use their own pooled connections so they actually overlap;
+    # the users they commit are collected here and deleted afterwards
+    created = []
+    shared_get_db = app.dependency_overrides.pop(get_db)
+    yield created
+    app.dependency_overrides[get_db] = shared_get_db
+    async with engine.begin() as connection:
+        await connection.execute(
+            text("DELETE FROM users WHERE username = ANY(:usernames)"),
+            {"usernames": created},
+        )
+
+
+@pytest_asyncio.fixture(scope="session")
+async def async_client(db_connection):
     transport = ASGITransport(app=app)
     async with AsyncClient(transport=transport, base_url="http://testserver") as ac:
         yield ac
 
 
 @pytest_asyncio.fixture
-async def db_session() -> AsyncSession:
-    async with async_session() as session:
+async def db_session(db_connection) -> AsyncSession:
+    async with async_session(
+        bind=db_connection, join_transaction_mode="rollback_only"
+    ) as session:
         yield session
 
 
-"""ASYNC FIXTURE ERROR"""
-# @pytest_asyncio.fixture
-# async def token(async_client: AsyncClient):
-#     # User registration
-#     random_username = random.randint(0, 9999999999)
-#     response = await async_client.post(
-#         "/auth/register",
-#         json={
-#             "username": f"{random_username}",
-#             "first_name": "Test",
-#             "last_name": "Test",
-#             "email": f"{random_username}@test.com",
-#             "password": "test_password",
-#         },
-#     )
-#     assert response.status_code == 200
-#
-#     # Login to get token
-#     response = await async_client.post(
-#         "/auth/login",
-#         json={"username": random_username, "password": "test_password"},
-#     )
-#     assert response.status_code == 200, response.text
-#
-#     return response.json()["access_token"]
+@pytest_asyncio.fixture(scope="session")
+async def registered_user(async_client: AsyncClient, usernames):
+    # User registration
+    username = next(usernames)
+    response = await async_client.post(
+        "/auth/register",
+        json={
+            "username": username,
+            "first_name": "Test",
+            "last_name": "Test",
+            "email": username + "@test.com",
+            "password": "test_password",
+        },
+    )
+    assert response.status_code == 200, response.text
+
+    # Login to get token
+    response = await async_client.post(
+        "/auth/login",
+        json={"username": username, "password": "test_password"},
+    )
+    assert response.status_code == 200, response.text
+
+    yield {"username": username, "token": response.json()["access_token"]}
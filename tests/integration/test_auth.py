@@ -1,31 +1,45 @@
-import pytest
-import random
+import jwt
+import asyncio
 
 from httpx import AsyncClient
 
+from app.core.config import SECRET_KEY, ALGORITHM
 
-@pytest.mark.asyncio
-async def test_register_and_login(async_client: AsyncClient):
+
+def test_register_and_login(registered_user: dict):
     """FUNCTION TO TEST REGISTRATION AND AUTHENTICATION"""
+    payload = jwt.decode(registered_user["token"], SECRET_KEY, algorithms=[ALGORITHM])
+    assert payload["sub"] == registered_user["username"]
+
 
-    # User registration
-    random_username = random.randint(0, 9999999999)
+async def register_and_login(async_client: AsyncClient, username: str) -> dict:
     response = await async_client.post(
         "/auth/register",
         json={
-            "username": f"{random_username}",
+            "username": username,
             "first_name": "Test",
             "last_name": "Test",
-            "email": f"{random_username}@test.com",
+            "email": username + "@test.com",
             "password": "test_password",
         },
     )
     assert response.status_code == 200
 
-    # User authentication
     response = await async_client.post(
         "/auth/login",
-        json={"username": f"{random_username}", "password": "test_password"},
+        json={"username": username, "password": "test_password"},
     )
     assert response.status_code == 200
-    assert "access_token" in response.json()
+    return response.json()
+
+
+async def test_register_and_login_batch(
+    async_client: AsyncClient, usernames, committed_usernames: list
+):
+    """FUNCTION TO TEST CONCURRENT REGISTRATION AND AUTHENTICATION"""
+    batch = [next(usernames) for _ in range(16)]
+    committed_usernames.extend(batch)
+    tokens = await asyncio.gather(
+        *(register_and_login(async_client, username) for username in batch)
+    )
+    assert all("access_token" in token for token in tokens)
@@ -1,26 +1,105 @@
-# import pytest
-
-# from httpx import AsyncClient
-
-"""ASYNC FIXTURE ERROR"""
-
-# @pytest.mark.asyncio
-# async def test_create_and_get_book(async_client: AsyncClient, token: str):
-#     headers = {"Authorization": f"Bearer {token}"}
-#
-#     # Book creation
-#     response = await async_client.post(
-#         "/api/books/create",
-#         headers=headers,
-#         json={"title": "New Test Book", "genre": "Science", "published_year": 2025},
-#     )
-#     assert response.status_code == 200
-#     data = response.json()
-#     assert data["title"] == "New Test Book"
-#
-#     # Retrieving all books
-#     response = await async_client.post(
-#         "/api/books/get", headers=headers, json={"title": "New Test Book"}
-#     )
-#     assert response.status_code == 200, response.text
-#     assert any(book["title"] == "New Test Book" for book in response.json())
+from httpx import AsyncClient
+
+
+async def test_create_and_get_book(async_client: AsyncClient, registered_user: dict):
+    """FUNCTION TO TEST BOOK CREATION, RETRIEVAL AND DELETION"""
+    headers = {"Authorization": f"Bearer {registered_user['token']}"}
+    # Usernames are unique, so titles built from one only match this test's books
+    title = f"Test Book {registered_user['username']}"
+
+    # Book creation
+    book_ids = []
+    for suffix in ("A", "B"):
+        response = await async_client.post(
+            "/api/books/create",
+            headers=headers,
+            json={
+                "title": f"{title} {suffix}",
+                "genre": "Science",
+                "published_year": 2025,
+            },
+        )
+        assert response.status_code == 200, response.text
+        data = response.json()
+        assert data["title"] == f"{title} {suffix}"
+        assert data["author"]["username"] == registered_user["username"]
+        book_ids.append(data["id"])
+
+    # Retrieving one book
+    response = await async_client.get(f"/api/books/get/{book_ids[0]}", headers=headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["title"] == f"{title} A"
+
+    # Retrieving filtered books one page at a time
+    response = await async_client.post(
+        "/api/books/get", headers=headers, params={"title": title, "limit": 1}
+    )
+    assert response.status_code == 200, response.text
+    assert [book["title"] for book in response.json()] == [f"{title} A"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await async_client.post(
+        "/api/books/get",
+        headers=headers,
+        params={"title": title, "limit": 1, "cursor": cursor},
+    )
+    assert response.status_code == 200, response.text
+    assert [book["title"] for book in response.json()] == [f"{title} B"]
+    cursor = response.headers["X-Next-Cursor"]
+
+    response = await async_client.post(
+        "/api/books/get",
+        headers=headers,
+        params={"title": title, "limit": 1, "cursor": cursor},
+    )
+    assert response.status_code == 404, response.text
+
+    # Book deletion
+    for book_id in book_ids:
+        response = await async_client.delete(
+            f"/api/books/delete/{book_id}", headers=headers
+        )
+        assert response.status_code == 204, response.text
+
+    response = await async_client.get(f"/api/books/get/{book_ids[0]}", headers=headers)
+    assert response.status_code == 404, response.text
+
+
+async def test_export_books(async_client: AsyncClient, registered_user: dict):
+    """FUNCTION TO TEST STREAMED BOOK EXPORT"""
+    headers = {"Authorization": f"Bearer {registered_user['token']}"}
+    title = f"Export Book {registered_user['username']}"
+
+    # The book is never committed, so the export must share the test transaction
+    response = await async_client.post(
+        "/api/books/create",
+        headers=headers,
+        json={"title": title, "genre": "History", "published_year": 1999},
+    )
+    assert response.status_code == 200, response.text
+
+    response = await async_client.get(
+        "/api/books/export", headers=headers, params={"format": "json"}
+    )
+    assert response.status_code == 200, response.text
+    assert any(book["title"] == title for book in response.json())
+
+    response = await async_client.get(
+        "/api/books/export", headers=headers, params={"format": "csv"}
+    )
+    assert response.status_code == 200, response.text
+    assert response.text.startswith("id,title,genre,published_year,author")
+    assert title in response.text
+
+
+async def test_create_book_with_long_title(
+    async_client: AsyncClient, registered_user: dict
+):
+    """FUNCTION TO TEST THAT OVERLONG TITLES ARE REJECTED BEFORE THE DATABASE"""
+    headers = {"Authorization": f"Bearer {registered_user['token']}"}
+    response = await async_client.post(
+        "/api/books/create",
+        headers=headers,
+        json={"title": "a" * 3200, "genre": "Fiction", "published_year": 1965},
+    )
+    assert response.status_code == 422, response.text
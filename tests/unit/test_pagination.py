@@ -0,0 +1,23 @@
+import pytest
+from fastapi import HTTPException
+
+from app.api.book import _encode_cursor, _decode_cursor
+
+
+def test_pagination_cursor_round_trip():
+    """FUNCTION TO TEST KEYSET PAGINATION CURSOR"""
+    cursor = _encode_cursor("Dune", 42)
+    assert _decode_cursor(cursor, "title") == ("Dune", 42)
+
+    with pytest.raises(HTTPException):
+        _decode_cursor(cursor, "published_year")
+    with pytest.raises(HTTPException):
+        _decode_cursor("not-a-cursor", "title")
+    with pytest.raises(HTTPException):
+        _decode_cursor(_encode_cursor(10**12, 42), "published_year")
+    with pytest.raises(HTTPException):
+        _decode_cursor(_encode_cursor("Dune", 2**31), "title")
+    with pytest.raises(HTTPException):
+        _decode_cursor(_encode_cursor("Dune", True), "title")
+    with pytest.raises(HTTPException):
+        _decode_cursor(_encode_cursor("Du\x00ne", 42), "title")
@@ -0,0 +1,27 @@
+import datetime
+
+import pytest
+from pydantic import ValidationError
+
+from app.schemas.book import BookCreate, BookUpdate
+
+
+def test_book_title_and_year_validation():
+    """FUNCTION TO TEST BOOK SCHEMA VALIDATION"""
+    book = BookCreate(title="  Dune ", genre="Fiction", published_year=1965)
+    assert book.title == "Dune"
+    assert BookCreate(title="a" * 255, genre="Fiction", published_year=1965)
+
+    next_year = datetime.date.today().year + 1
+    for invalid in (
+        {"title": "   ", "genre": "Fiction", "published_year": 1965},
+        {"title": "a" * 256, "genre": "Fiction", "published_year": 1965},
+        {"title": "Dune", "genre": "Fiction", "published_year": 1799},
+        {"title": "Dune", "genre": "Fiction", "published_year": next_year},
+    ):
+        with pytest.raises(ValidationError):
+            BookCreate(**invalid)
+
+    assert BookUpdate().title is None
+    with pytest.raises(ValidationError):
+        BookUpdate(title="")
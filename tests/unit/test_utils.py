@@ -1,14 +1,25 @@
-from jose import jwt
+import jwt
+import bcrypt
+from datetime import datetime, timezone
 
 from app.core.config import SECRET_KEY, ALGORITHM
 from app.core.security import verify_password, get_password_hash, create_access_token
 
+# Hashed once per module so tests that only verify don't pay for the KDF
+PASSWORD = "secure_password"
+PASSWORD_HASH = get_password_hash(PASSWORD)
+
 
 def test_password_hashing_and_verification():
     """FUNCTION TO TEST PASSWORD HASHING"""
-    password = "secure_password"
-    hashed = get_password_hash(password)
-    assert verify_password(password, hashed)
+    assert verify_password(PASSWORD, PASSWORD_HASH)
+
+
+def test_legacy_bcrypt_hash_verification():
+    """FUNCTION TO TEST PASSWORDS HASHED BEFORE THE SWITCH TO ARGON2"""
+    hashed = bcrypt.hashpw(PASSWORD.encode(), bcrypt.gensalt(rounds=4)).decode()
+    assert verify_password(PASSWORD, hashed)
+    assert not verify_password("wrong_password", hashed)
 
 
 def test_create_access_token():
@@ -16,3 +27,9 @@ def test_create_access_token():
     token = create_access_token({"sub": "testuser"})
     decoded = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
     assert decoded["sub"] == "testuser"
+
+    # Datetime claims are converted to NumericDate, not serialized as strings
+    issued_at = datetime.now(timezone.utc)
+    token = create_access_token({"sub": "testuser", "iat": issued_at})
+    decoded = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    assert decoded["iat"] == int(issued_at.timestamp())